@@ -32,29 +32,54 @@ def measure_time(func):
 
 class DatabaseConnectionBase:
 
-    def __init__(self, db_info: dict, measure_time: bool) -> None:
+    def __init__(self, db_info: dict, measure_time: bool, con=None) -> None:
         """Initialize the connection to Postgre Database.
 
         Args:
             db_info (dict): connection data of the database
             measure_time (bool): measure time for database operations
+            con (psycopg2 connection): existing connection to share
+                instead of opening a new one. A shared connection is not
+                closed by this object, the owner has to close it.
 
         Raises:
             VallueError: when creating the connection failed
 
         """
-        try:
-            self.con = psycopg2.connect(
-                user=db_info['user'],
-                password=db_info['password'],
-                host=db_info['host'],
-                port=db_info['port'],
-                database=db_info['dbname']
-            )
-        except Exception as err:
-            raise ValueError(f'Database initialization error: {err}')
+        self._shared_con = con is not None
+        if self._shared_con:
+            self.con = con
+        else:
+            try:
+                self.con = psycopg2.connect(
+                    user=db_info['user'],
+                    password=db_info['password'],
+                    host=db_info['host'],
+                    port=db_info['port'],
+                    database=db_info['dbname']
+                )
+            except Exception as err:
+                raise ValueError(f'Database initialization error: {err}')
         self._time = 0
         self._measure_time = measure_time
+        self._curs = None
+
+
+    def cursor(self):
+        """Return the shared cursor of this connection.
+
+        Creating a cursor per query allocates and frees server-side
+        state every time, so one cursor is kept open and reused across
+        calls. It survives rollbacks and is closed together with the
+        connection.
+
+        Returns:
+            psycopg2 cursor: the shared cursor
+
+        """
+        if self._curs is None or self._curs.closed:
+            self._curs = self.con.cursor()
+        return self._curs
 
 
     def clear_time(self) -> None:
@@ -74,4 +99,7 @@ class DatabaseConnectionBase:
 
     def close(self) -> None:
         """Close the database connection."""
-        self.con.close()
+        if self._curs is not None and not self._curs.closed:
+            self._curs.close()
+        if not self._shared_con:
+            self.con.close()
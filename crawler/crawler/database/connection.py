@@ -160,15 +160,13 @@ class DatabaseConnection(DatabaseConnectionBase):
         """
         if len(file_ids) < 1:
             return
-        files = Table('files')
-        query = Query.update(files) \
-            .set(files.deleted, 'True') \
-            .set(files.deleted_time, datetime.now()) \
-            .where(files.id.isin(Parameter('%s')))
         curs = self.con.cursor()
-        query = curs.mogrify(str(query), (tuple(file_ids),))
         try:
-            curs.execute(query)
+            curs.execute(
+                'UPDATE "files" SET "deleted" = true, "deleted_time" = now() '
+                'WHERE "id" = ANY(%s)',
+                (list(file_ids),)
+            )
             curs.close()
             self.con.commit()
         except Exception as e:
@@ -1,15 +1,15 @@
 """Connection to database for file insertion related tasks"""
 
 # Python imports
+import csv
+import io
 import json
 import logging
 import os
-from datetime import datetime
 from typing import List, Tuple, Dict
 
 # 3rd party modules
-import psycopg2
-from pypika import Query, Table, Field, Parameter
+from psycopg2.extras import execute_values, Json
 
 # Local imports
 from .base import measure_time
@@ -19,6 +19,20 @@ from crawler.services.config import Config
 import crawler.communication as communication
 
 
+# Minimum number of rows before COPY is preferred over a multi-row INSERT
+_COPY_MIN_BATCH_SIZE = 500
+
+# Statements for inserting new files into the 'files' table, built once
+# at import time instead of on every batch
+_INSERT_FILES_SQL = \
+    'INSERT INTO "files" ("crawl_id","dir_path","name","type","size","metadata","creation_time", ' \
+    '"access_time","modification_time","deleted","deleted_time","file_hash", "in_metadata") VALUES %s'
+_COPY_FILES_SQL = \
+    'COPY "files" ("crawl_id","dir_path","name","type","size","metadata","creation_time", ' \
+    '"access_time","modification_time","deleted","deleted_time","file_hash", "in_metadata") ' \
+    'FROM STDIN WITH (FORMAT CSV)'
+
+
 class DatabaseConnectionFiles(DatabaseConnectionBase):
 
 
@@ -27,99 +41,133 @@ class DatabaseConnectionFiles(DatabaseConnectionBase):
             db_info=db_info,
             measure_time=measure_time
         )
+        self._statements_prepared = False
+
+
+    def _prepare_statements(self) -> None:
+        """Prepare the statements of the recurring per-directory queries.
+
+        check_directory and set_deleted run once per visited directory,
+        so the statements are prepared once per connection and only
+        Bind/Execute is sent on each call afterwards.
+        """
+        curs = self.cursor()
+        # The subqueries select the second highest crawl id for the
+        # directory, i.e. the most recent crawl before the current one
+        curs.execute(
+            'PREPARE files_check_directory(text, text[]) AS '
+            'SELECT "id", "metadata" FROM "files" '
+            'WHERE "dir_path" = $1 '
+            'AND "crawl_id" = ('
+            'SELECT max("crawl_id") FROM "files" WHERE "dir_path" = $1 '
+            'AND "crawl_id" < (SELECT max("crawl_id") FROM "files" WHERE "dir_path" = $1)'
+            ') '
+            'AND "file_hash" = ANY($2)'
+        )
+        curs.execute(
+            'PREPARE files_set_deleted(bigint[]) AS '
+            'UPDATE "files" SET "deleted" = true, "deleted_time" = now() '
+            'WHERE "id" = ANY($1)'
+        )
+        # Commit right away so the statements survive a rollback of the
+        # first caller's transaction
+        self.con.commit()
+        self._statements_prepared = True
 
 
     @measure_time
     def insert_new_record_files(self, insert_values: List[Tuple[str]]) -> None:
         """Insert a new record to the 'files' table based on the ExifTool output.
 
+        Large batches are streamed with COPY which bypasses the per-row
+        parse/plan path in Postgres, small batches use a multi-row INSERT.
+
         Args:
             insert_values (List[Tuple[str]): A list of lists. Contains the values for each row to be inserted.
 
         """
-        # Construct the SQL query for inserting the new files into the 'files' table
-        query = 'INSERT INTO "files" ("crawl_id","dir_path","name","type","size","metadata","creation_time", ' \
-                '"access_time","modification_time","deleted","deleted_time","file_hash", "in_metadata") VALUES '
-        curs = self.con.cursor()
-        for insert in insert_values:
-            query += curs.mogrify("(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s),", insert).decode('utf8')
-        # Execute the constructed query (Rollback in case of error)
+        curs = self.cursor()
+        # Execute the query in one round trip (Rollback in case of error)
         try:
-            curs.execute(query[:-1])
+            if len(insert_values) < _COPY_MIN_BATCH_SIZE:
+                execute_values(curs, _INSERT_FILES_SQL, insert_values, page_size=1000)
+            else:
+                # An empty unquoted field is read as NULL by COPY CSV,
+                # which is what csv.writer emits for None values.
+                # Json values carry the raw dict and are dumped here
+                # since COPY expects the serialized text.
+                buffer = io.StringIO()
+                writer = csv.writer(buffer, quoting=csv.QUOTE_MINIMAL)
+                for insert in insert_values:
+                    writer.writerow([
+                        json.dumps(value.adapted) if isinstance(value, Json) else value
+                        for value in insert
+                    ])
+                buffer.seek(0)
+                curs.copy_expert(_COPY_FILES_SQL, buffer)
         except:
             logging.warning('"Error inserting data into database"')
-            curs.close()
             self.con.rollback()
             raise
-        curs.close()
         self.con.commit()
         return
 
 
     @measure_time
-    def check_directory(self, path: str, current_hashes: List[str]) -> List[int]:
+    def check_directory(self, path: str, current_hashes: List[str]) -> List[Tuple[int, dict]]:
         """checks the database for a given directory.
 
-        Returns all the most recent ids.
+        Returns id and metadata of every file of the previous crawl of the
+        directory whose hash is still present. The filtering on the second
+        highest crawl id and the hashes is done by the database, so only
+        the matching rows are transferred.
 
         Args:
             path (str): directory path to be checked
             current_hashes (List[str]): list of all hashes from current files
 
         Returns:
-            List(int): file ids that are supposed to be deleted
+            List[Tuple[int, dict]]: id/metadata pairs of files that are supposed to be deleted
 
         """
-        files = Table('files')
-        query = Query.from_(files) \
-            .select('id', 'crawl_id', 'dir_path', 'name', 'file_hash', 'metadata') \
-            .where(files.dir_path == Parameter('%s'))
-        curs = self.con.cursor()
-        query = curs.mogrify(str(query), (path,))
+        if not self._statements_prepared:
+            self._prepare_statements()
+        curs = self.cursor()
         try:
-            curs.execute(query)
+            curs.execute(
+                'EXECUTE files_check_directory(%s, %s)',
+                (path, list(current_hashes))
+            )
             get = curs.fetchall()
         except:
+            self.con.rollback()
             return []
-        curs.close()
         self.con.commit()
-
-        # Find the second highest crawl id (remove max first as it is the current crawl)
-        id_set = set([x[1] for x in get])
-        id_set.remove(max(id_set))
-        if len(id_set) == 0:
-            return []
-        recent_crawl = max(id_set)
-        # Make list with every file_id in that directory/crawl
-        file_ids = [(x[0],x[-1]) for x in get if x[1] == recent_crawl and x[-2] in current_hashes]
-        return file_ids
+        return get
 
 
     @measure_time
     def set_deleted(self, file_ids: List[int]) -> None:
         """Set every file in file_ids deleted and deleted_time value.
 
+        All ids are updated in one statement and one transaction, the
+        deletion time is taken from the server clock.
+
         Args:
             file_ids (List[int): List of file ids to be deleted
 
         """
         if len(file_ids) < 1:
             return
-        files = Table('files')
-        query = Query.update(files) \
-            .set(files.deleted, 'True') \
-            .set(files.deleted_time, datetime.now()) \
-            .where(files.id.isin(Parameter('%s')))
-        curs = self.con.cursor()
-        query = curs.mogrify(str(query), (tuple(file_ids),))
+        if not self._statements_prepared:
+            self._prepare_statements()
+        curs = self.cursor()
         try:
-            curs.execute(query)
-            curs.close()
+            curs.execute('EXECUTE files_set_deleted(%s)', (list(file_ids),))
             self.con.commit()
         except Exception as e:
             print(e)
             logging.warning('"Error updating file deletion"')
-            curs.close()
             self.con.rollback()
 
 
@@ -136,16 +184,13 @@ class DatabaseConnectionFiles(DatabaseConnectionBase):
         """
         if not ids:
             return 0
-        curs = self.con.cursor()
-        sql = curs.mogrify('DELETE FROM files WHERE id IN %s;', (tuple(ids),))
+        curs = self.cursor()
         try:
-            curs.execute(sql, ids)
+            curs.execute('DELETE FROM files WHERE id IN %s;', (tuple(ids),))
             num = curs.rowcount
-            curs.close()
             self.con.commit()
         except Exception as e:
             logging.warning(f'Failed deleting files: {str(e)}')
-            curs.close()
             self.con.rollback()
             return None
         return num
@@ -21,10 +21,11 @@ import crawler.communication as communication
 
 class DatabaseConnectionMetadata(DatabaseConnectionBase):
 
-    def __init__(self, db_info: dict, measure_time: bool):
+    def __init__(self, db_info: dict, measure_time: bool, con=None):
         super(DatabaseConnectionMetadata, self).__init__(
             db_info=db_info,
-            measure_time=measure_time
+            measure_time=measure_time,
+            con=con
         )
 
 
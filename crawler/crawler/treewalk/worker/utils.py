@@ -2,9 +2,17 @@
 
 
 # Python imports
-import json
+import re
 from typing import Tuple
 
+# 3rd party imports
+from psycopg2.extras import Json
+
+
+# ExifTool reports dates as 'YYYY:MM:DD HH:MM:SS...', the capture groups
+# rewrite the date part with dashes so Postgres accepts the timestamp
+_DATE_RE = re.compile(r'^(\d{4}):(\d{2}):(\d{2})(.*)$')
+
 
 def create_insert(crawl_id: int, exif: dict) -> Tuple[str]:
     """Helper method for collecting all the values from the output of a file.
@@ -39,16 +47,16 @@ def create_insert(crawl_id: int, exif: dict) -> Tuple[str]:
         except:
             insert_values += (None,)
     try:
-        # TODO better fix than dumping the json in the worker
-        # (after extracting the single file tags)
-        insert_values += (json.dumps(exif),)
+        # The Json wrapper lets psycopg2 serialize and escape the dict
+        # in one pass when the row is sent to the database
+        insert_values += (Json(exif),)
     except:
         insert_values += ('NULL',)
     for i in ['FileAccessDate', 'FileModifyDate', 'FileCreationDate']:
         try:
-            valueTmp = f'{exif[i]}'
-            valueFormat = valueTmp[:12].replace(':', '-') + valueTmp[13:]
-            if valueFormat == '0000-00-00 0:00:00':
+            match = _DATE_RE.match(f'{exif[i]}')
+            valueFormat = f'{match[1]}-{match[2]}-{match[3]}{match[4]}'
+            if valueFormat == '0000-00-00 00:00:00':
                 insert_values += ('-infinity',)
             else:
                 insert_values += (valueFormat,)
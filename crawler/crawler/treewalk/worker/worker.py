@@ -7,16 +7,18 @@ are required for speeding up the execution time.
 """
 
 # Python imports
-import json
+import mmap
 import os
 import queue
 import hashlib
 import subprocess
 import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Dict
 from datetime import datetime
 
 # 3rd party imports
+import ijson
 from psycopg2.extensions import connection
 
 # Local imports
@@ -77,6 +79,43 @@ def measure_hashing(func):
     return decorator
 
 
+# Minimum file size before hashing goes through mmap instead of read calls
+_MMAP_MIN_FILE_SIZE = 1 << 26
+
+
+class _ExifToolOutputReader:
+    """File-like reader for the output of one ExifTool -execute run.
+
+    Wraps the stdout of the stay_open ExifTool process and reports end
+    of file once the {ready} sentinel is reached, so the JSON array of
+    a work package can be parsed incrementally while the tool is still
+    writing without consuming the output of the next package.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._done = False
+
+    def read(self, size: int = -1) -> bytes:
+        """Return the next output line or b'' at the sentinel.
+
+        Args:
+            size (int): requested number of bytes, short reads are fine
+                for ijson so one line is returned at a time
+
+        Returns:
+            bytes: next line of the current run or b'' on end of output
+
+        """
+        if size == 0 or self._done:
+            return b''
+        line = self._stream.readline()
+        if not line or line.strip() == b'{ready}':
+            self._done = True
+            return b''
+        return line
+
+
 class Worker(multiprocessing.Process):
 
     def __init__(
@@ -107,15 +146,20 @@ class Worker(multiprocessing.Process):
         self._num_workers = num_workers
         self._exiftool_time = 0
         self._hashing_time = 0
+        self._exiftool_process = None
+        self._hash_executor = None
         self._event_can_exit = event_can_exit
         self._debug = debug
         self._db_connection_files = database.DatabaseConnectionFiles(
             db_info=connection_data,
             measure_time=self._measure_time
         )
+        # Both connection objects share one backend connection, so each
+        # worker only occupies a single connection slot on the server
         self._db_connection_metadata = database.DatabaseConnectionMetadata(
             db_info=connection_data,
-            measure_time=self._measure_time
+            measure_time=self._measure_time,
+            con=self._db_connection_files.con
         )
 
     def message(self, msg: str, ignore: bool = False) -> None:
@@ -134,6 +178,7 @@ class Worker(multiprocessing.Process):
         """Run the worker process."""
         paused = False
         self.message('Hello!')
+        self._hash_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
         while True:
             command = self._queue_input.get()
             self.message(f'received command {command.command}.')
@@ -160,6 +205,11 @@ class Worker(multiprocessing.Process):
     def run_exiftool(self, package: List[str]) -> dict:
         """Run the ExifTool on the package.
 
+        The ExifTool runs in -stay_open mode, so its Perl interpreter is
+        started once per worker instead of once per work package. The
+        package is written as an argfile to stdin and the output is read
+        up to the {ready} sentinel the tool prints after each -execute.
+
         Args:
             package (List[str]): work package
 
@@ -168,15 +218,27 @@ class Worker(multiprocessing.Process):
 
         """
         try:
-            process = subprocess.Popen(
-                [f'{self._exiftool}', '-n', '-json', *package],
-                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
-            )
-            # FIXME better solution?
-            output = str(process.stdout.read(), 'utf-8')
-            if output:
-                metadata = json.loads(output)
-            else:
+            if self._exiftool_process is None or self._exiftool_process.poll() is not None:
+                self._exiftool_process = subprocess.Popen(
+                    [f'{self._exiftool}', '-stay_open', 'True', '-@', '-'],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL
+                )
+            args = '\n'.join(['-n', '-json', *package, '-execute\n'])
+            self._exiftool_process.stdin.write(args.encode('utf-8'))
+            self._exiftool_process.stdin.flush()
+            # Parse the JSON array incrementally while the ExifTool is
+            # still producing output instead of buffering it as a whole
+            reader = _ExifToolOutputReader(self._exiftool_process.stdout)
+            try:
+                metadata = list(ijson.items(reader, 'item', use_float=True))
+            finally:
+                # Always consume up to the sentinel so a parse error
+                # doesn't leave stale output for the next package
+                while reader.read():
+                    pass
+            if not metadata:
                 return None
         except:
             self.message('error executing the ExifTool!', ignore=True)
@@ -184,9 +246,13 @@ class Worker(multiprocessing.Process):
         return metadata
 
 
-    @measure_hashing
-    def run_hashing(self, fpath: str) -> str:
-        """Run the hashing on the given file.
+    def _hash_file(self, fpath: str) -> str:
+        """Hash a single file.
+
+        The file is never loaded into memory as a whole. Large files are
+        memory-mapped so the digest reads the page cache directly and
+        the kernel prefetches sequentially, smaller ones are streamed in
+        chunks.
 
         Args:
             fpath (str): file path
@@ -195,13 +261,51 @@ class Worker(multiprocessing.Process):
             str: sha256 hash
 
         """
-        # compute the hash256 and add it to the values string
-        with open(fpath, 'rb') as file:
-            bytes = file.read()
-            hash256 = hashlib.sha256(bytes).hexdigest()
+        with open(fpath, 'rb', buffering=1 << 20) as file:
+            if os.fstat(file.fileno()).st_size >= _MMAP_MIN_FILE_SIZE:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    sha256 = hashlib.sha256()
+                    sha256.update(memoryview(mapped))
+                    hash256 = sha256.hexdigest()
+            elif hasattr(hashlib, 'file_digest'):
+                # Python >= 3.11 hashes the stream directly in OpenSSL
+                hash256 = hashlib.file_digest(file, 'sha256').hexdigest()
+            else:
+                sha256 = hashlib.sha256()
+                for chunk in iter(lambda: file.read(1 << 20), b''):
+                    sha256.update(chunk)
+                hash256 = sha256.hexdigest()
         return hash256
 
 
+    @measure_hashing
+    def run_hashing(self, fpaths: List[str], futures: Dict = None) -> List[str]:
+        """Run the hashing on the given files.
+
+        hashlib releases the GIL while digesting, so the files of a work
+        package are hashed concurrently in a thread pool. This overlaps
+        disk reads with the hash computation across cores. Files whose
+        hashing was already started while the ExifTool was running are
+        picked up from the given futures, only the remaining ones are
+        submitted here.
+
+        Args:
+            fpaths (List[str]): file paths
+            futures (Dict): hash futures already submitted per file path
+
+        Returns:
+            List[str]: sha256 hash of each file, in input order
+
+        """
+        if futures is None:
+            futures = {}
+        pending = [
+            futures.get(fpath) or self._hash_executor.submit(self._hash_file, fpath)
+            for fpath in fpaths
+        ]
+        return [future.result() for future in pending]
+
+
     def _do_work(self, package: List[str]) -> None:
         """Process the work package.
 
@@ -228,13 +332,21 @@ class Worker(multiprocessing.Process):
         if not package:
             clean_up()
             return
+        # Start hashing the files of the package in the background so
+        # the disk reads overlap with the ExifTool run. Directory
+        # packages are resolved by the ExifTool, their files are hashed
+        # later on.
+        hash_futures = {
+            fpath: self._hash_executor.submit(self._hash_file, fpath)
+            for fpath in package if os.path.isfile(fpath)
+        }
         # Run the exiftool
         metadata = self.run_exiftool(package)
         if metadata is None:
             clean_up()
             return
 
-        inserts = []
+        pending = []
         tag_values = []
         for result in metadata:
             # get the exif output for file x
@@ -246,15 +358,18 @@ class Worker(multiprocessing.Process):
                     ignore=True
                 )
                 continue
-            # compute the hash256 and add it to the values string
-            fpath = f"{result['Directory']}/{result['FileName']}".replace("\'\'", "\'")
-            hash256 = self.run_hashing(fpath)
-            insert_values += (hash256, False)
-            # add the value string to the rest for insert batching
             # FIXME Better solution for ignoring files with no file_type?
             if insert_values[3] == 'NULL':
                 continue
-            inserts.append(insert_values)
+            fpath = f"{result['Directory']}/{result['FileName']}".replace("\'\'", "\'")
+            pending.append((insert_values, fpath))
+        # compute the hash256 of every file in parallel and
+        # add it to the value tuples for insert batching
+        hashes = self.run_hashing([fpath for _, fpath in pending], hash_futures)
+        inserts = [
+            insert_values + (hash256, False)
+            for (insert_values, _), hash256 in zip(pending, hashes)
+        ]
 
         # insert into the database
         try:
@@ -275,12 +390,13 @@ class Worker(multiprocessing.Process):
         # Check if there was a previous entry in the database
         # if yes: Delete the file (files that were moved since then are deleted in the manager)
         toDelete = []
-        directories = set([x[1] for x in inserts])
+        directories = set(x[1] for x in inserts)
+        current_hashes = [x[-2] for x in inserts]
         # List of jsons with the old data (Used for the metadata management)
         jsons = []
         try:
             for dir in directories:
-                file_ids = self._db_connection_files.check_directory(dir, [x[-2] for x in inserts])
+                file_ids = self._db_connection_files.check_directory(dir, current_hashes)
                 if file_ids:
                     toDelete.extend([x[0] for x in file_ids])
                     jsons.extend([x[1] for x in file_ids])
@@ -297,7 +413,7 @@ class Worker(multiprocessing.Process):
             # Create comprehensive dictionaries of all increases and
             # decreases to be made in the 'metadata' table.
             metadata_increase = create_metadata(
-                exif_output=[json.loads(j[5]) for j in inserts],
+                exif_output=[j[5].adapted for j in inserts],
                 increase=True
             )
             metadata_decrease = create_metadata(
@@ -313,8 +429,20 @@ class Worker(multiprocessing.Process):
     def _clean_up(self) -> None:
         """Clean up method for cleaning up all used resources."""
         self.message('cleaning up before exiting.')
-        self._db_connection_files.close()
+        if self._hash_executor is not None:
+            self._hash_executor.shutdown()
+        if self._exiftool_process is not None and self._exiftool_process.poll() is None:
+            try:
+                self._exiftool_process.stdin.write(b'-stay_open\nFalse\n')
+                self._exiftool_process.stdin.flush()
+                self._exiftool_process.stdin.close()
+                self._exiftool_process.wait()
+            except:
+                self._exiftool_process.kill()
+        # Close the metadata connection first, it shares the connection
+        # owned by the files connection object
         self._db_connection_metadata.close()
+        self._db_connection_files.close()
         response = communication.Response(
             success=True,
             message=(